@@ -0,0 +1,58 @@
+import time
+import uuid
+from functools import wraps
+from flask import jsonify, make_response, request
+from flask_caching import Cache
+
+cache = Cache()
+
+def _version(namespace):
+    return cache.get(f'{namespace}:version') or '0'
+
+def _is_success(rv):
+    status = rv[1] if isinstance(rv, tuple) else rv.status_code
+    return status == 200
+
+def cached_view(namespace, timeout, unless=None):
+    # Caches a GET view per URL (path + query string). The key embeds the
+    # namespace version, so invalidate() drops every cached page/filter
+    # combination of that namespace at once. Requests for which unless()
+    # returns True skip the cache, e.g. responses that vary per user
+    return cache.cached(
+        timeout=timeout,
+        make_cache_key=lambda *args, **kwargs: f'{namespace}:{_version(namespace)}:{request.full_path}',
+        response_filter=_is_success,
+        unless=unless
+    )
+
+def invalidate(*namespaces):
+    for namespace in namespaces:
+        cache.set(f'{namespace}:version', uuid.uuid4().hex, timeout=0)
+
+def conditional(view):
+    # Tags successful GET responses with an ETag of their body and answers
+    # a matching If-None-Match with an empty 304. Put it above cached_view so
+    # repeat fetches of a cached page cost neither a query nor the payload
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+        response.add_etag()
+        return response.make_conditional(request)
+    return wrapper
+
+def rate_limit(key_func, limit, window):
+    # Fixed-window counter in the shared cache. The window number is part of
+    # the key, so every window starts from zero and old counters just expire
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            bucket = int(time.time() // window)
+            key = f'ratelimit:{view.__name__}:{key_func()}:{bucket}'
+            cache.add(key, 0, timeout=window * 2)
+            if (cache.cache.inc(key) or 0) > limit:
+                return jsonify({'error': 'Rate limit exceeded, try again shortly'}), 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
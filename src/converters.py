@@ -0,0 +1,9 @@
+from werkzeug.routing import IntegerConverter
+
+
+class IdConverter(IntegerConverter):
+    # Primary keys are positive 32-bit integers. Anything outside that range
+    # fails to match the route and 404s without a database round-trip; on
+    # PostgreSQL an oversized id would otherwise be a query error
+    def __init__(self, map):
+        super().__init__(map, min=1, max=2**31 - 1)
@@ -3,9 +3,17 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify, send_from_directory
+from flask_compress import Compress
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from sqlalchemy import Column, inspect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import ClauseElement, visitors
+from werkzeug.exceptions import HTTPException
+from src.cache import cache
+from src.converters import IdConverter
+from src.json_provider import OrjsonProvider
 from src.models.models import db
 from src.routes.auth import auth_bp
 from src.routes.user import user_bp
@@ -16,8 +24,17 @@ from src.routes.event import event_bp
 from src.routes.tutorial import tutorial_bp
 from src.routes.message import message_bp
 
+def _index_columns(index):
+    # Every column an index needs, including those only named in an
+    # expression or a partial index's WHERE clause
+    clauses = [*index.expressions,
+               *(value for value in index.dialect_kwargs.values() if isinstance(value, ClauseElement))]
+    return {node.name for clause in clauses for node in visitors.iterate(clause) if isinstance(node, Column)}
+
 def create_app():
     app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.json = OrjsonProvider(app)
+    app.url_map.converters['id'] = IdConverter
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'student-connect-secret-key-2024')
@@ -30,16 +47,40 @@ def create_app():
         if database_url.startswith('postgres://'):
             database_url = database_url.replace('postgres://', 'postgresql://', 1)
         app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+        # Room for concurrent requests without waiting on checkout; pre-ping
+        # and recycle drop connections the server closed while idle. Size the
+        # pool to the worker's thread count via the environment
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 25)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 25)),
+            'pool_pre_ping': True,
+            'pool_recycle': 1800,
+            'pool_use_lifo': True
+        }
     else:
         # Development database (SQLite)
         app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
     
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # Cache configuration - shared Redis when available, per-process memory otherwise
+    redis_url = os.environ.get('REDIS_URL')
+    if redis_url:
+        app.config['CACHE_TYPE'] = 'RedisCache'
+        app.config['CACHE_REDIS_URL'] = redis_url
+    else:
+        app.config['CACHE_TYPE'] = 'SimpleCache'
+    
+    # Compress JSON responses worth compressing, preferring Brotli
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    
     # Initialize extensions
     jwt = JWTManager(app)
     CORS(app, origins="*")
     db.init_app(app)
+    cache.init_app(app)
+    Compress(app)
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -51,9 +92,45 @@ def create_app():
     app.register_blueprint(tutorial_bp, url_prefix='/api/tutorials')
     app.register_blueprint(message_bp, url_prefix='/api/messages')
     
+    # Errors raised from views become JSON responses here rather than in a
+    # try/except around every handler
+    @app.errorhandler(HTTPException)
+    def handle_http_error(e):
+        return jsonify({'error': e.description}), e.code
+    
+    @app.errorhandler(SQLAlchemyError)
+    def handle_database_error(e):
+        db.session.rollback()
+        app.logger.exception('Database error')
+        return jsonify({'error': 'Database error'}), 500
+    
+    @app.errorhandler(Exception)
+    def handle_unexpected_error(e):
+        app.logger.exception('Unhandled error')
+        return jsonify({'error': 'Internal server error'}), 500
+    
     # Create tables
     with app.app_context():
         db.create_all()
+        # create_all() skips tables that already exist, so make sure indexes
+        # added to existing models are created too. Indexes only speed
+        # queries up, so one that can't be built is logged and skipped
+        # rather than keeping the app from starting
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for index in table.indexes:
+                # A database created before a column was added to the model
+                # can't index it; there are no migrations to add the column
+                missing = _index_columns(index) - existing
+                if missing:
+                    app.logger.warning('Skipping index %s: %s has no column %s',
+                                       index.name, table.name, ', '.join(sorted(missing)))
+                    continue
+                try:
+                    index.create(db.engine, checkfirst=True)
+                except SQLAlchemyError:
+                    app.logger.exception('Could not create index %s', index.name)
     
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
@@ -71,9 +148,12 @@ def create_app():
             else:
                 return "API is running! Visit /api/auth/me to test.", 200
 
+    # The health payload never changes, so encode it once at startup
+    health_body = app.json.dumps({'status': 'healthy', 'message': 'StudentConnect API is running!'})
+
     @app.route('/health')
     def health_check():
-        return {'status': 'healthy', 'message': 'StudentConnect API is running!'}, 200
+        return app.response_class(health_body, mimetype='application/json')
     
     return app
 
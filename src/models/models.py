@@ -1,24 +1,66 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
 
-db = SQLAlchemy()
+# Handlers serialize what they just wrote after commit; keep those attributes
+# loaded instead of re-selecting every row that was part of the transaction
+db = SQLAlchemy(session_options={'expire_on_commit': False})
+
+def search_vector(*columns):
+    # Must stay identical to the expression used by the GIN indexes below
+    document = db.func.coalesce(columns[0], '')
+    for column in columns[1:]:
+        document = document + ' ' + db.func.coalesce(column, '')
+    return db.func.to_tsvector(db.literal_column("'english'"), document)
+
+def search_filter(columns, term):
+    # Full-text search backed by a GIN index on PostgreSQL; plain ILIKE on
+    # the SQLite development database
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return search_vector(*columns).op('@@')(
+            db.func.plainto_tsquery(db.literal_column("'english'"), term)
+        )
+    return db.or_(*[column.ilike(f'%{term}%') for column in columns])
+
+def json_array_contains(column, value):
+    # The column holds a JSON array as text; match whole entries rather than
+    # substrings. PostgreSQL answers with jsonb containment, which a GIN index
+    # on the same cast can serve; SQLite walks the array with json_each()
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return db.cast(column, JSONB).contains([value])
+    entries = db.func.json_each(column).table_valued('value')
+    return db.select(1).select_from(entries).where(entries.c.value == value).exists()
+
+def trigram_index(name, column):
+    # GIN trigram index, which lets PostgreSQL serve ILIKE '%term%' without a
+    # sequential scan. The pg_trgm extension is created along with it
+    index = db.Index(name, column, postgresql_using='gin',
+                     postgresql_ops={column: 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+    event.listen(index, 'before_create',
+                 DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+    return index
 
 # Association tables for many-to-many relationships
 user_communities = db.Table('user_communities',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('community_id', db.Integer, db.ForeignKey('community.id'), primary_key=True)
+    db.Column('community_id', db.Integer, db.ForeignKey('community.id'), primary_key=True),
+    db.Index('ix_user_communities_community_id', 'community_id')
 )
 
 user_projects = db.Table('user_projects',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
+    db.Index('ix_user_projects_project_id', 'project_id')
 )
 
 user_events = db.Table('user_events',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('event_id', db.Integer, db.ForeignKey('event.id'), primary_key=True)
+    db.Column('event_id', db.Integer, db.ForeignKey('event.id'), primary_key=True),
+    # The primary key leads with user_id; per-event counts need their own index
+    db.Index('ix_user_events_event_id', 'event_id')
 )
 
 class User(db.Model):
@@ -44,15 +86,21 @@ class User(db.Model):
     # Relationships
     posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='author', lazy=True, cascade='all, delete-orphan')
-    communities = db.relationship('Community', secondary=user_communities, lazy='subquery',
+    communities = db.relationship('Community', secondary=user_communities, lazy=True,
                                 backref=db.backref('members', lazy=True))
-    projects = db.relationship('Project', secondary=user_projects, lazy='subquery',
+    projects = db.relationship('Project', secondary=user_projects, lazy=True,
                              backref=db.backref('members', lazy=True))
-    events = db.relationship('Event', secondary=user_events, lazy='subquery',
-                           backref=db.backref('attendees', lazy=True))
+    events = db.relationship('Event', secondary=user_events, lazy=True,
+                           backref=db.backref('attendees', lazy=True, passive_deletes=True))
     sent_messages = db.relationship('Message', foreign_keys='Message.sender_id', backref='sender', lazy=True)
     received_messages = db.relationship('Message', foreign_keys='Message.receiver_id', backref='receiver', lazy=True)
 
+    # The user list only ever reads active accounts
+    __table_args__ = (
+        db.Index('ix_user_active_id', id,
+                 postgresql_where=is_active == True, sqlite_where=is_active == True),
+    )
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
@@ -84,12 +132,22 @@ class Community(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    category = db.Column(db.String(50))
+    category = db.Column(db.String(50), index=True)
     image_url = db.Column(db.String(255))
     is_private = db.Column(db.Boolean, default=False)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Updating a community's own columns can't change its member count, so
+    # keep the loaded value through a flush
+    member_count = db.column_property(
+        db.select(db.func.count())
+        .where(user_communities.c.community_id == id)
+        .correlate_except(user_communities)
+        .scalar_subquery(),
+        expire_on_flush=False
+    )
+    
     # Relationships
     posts = db.relationship('Post', backref='community', lazy=True, cascade='all, delete-orphan')
     creator = db.relationship('User', backref='created_communities')
@@ -103,7 +161,7 @@ class Community(db.Model):
             'image_url': self.image_url,
             'is_private': self.is_private,
             'created_by': self.created_by,
-            'member_count': len(self.members),
+            'member_count': self.member_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -121,9 +179,31 @@ class Project(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Counted in the same SELECT as the project, so lists don't load every
+    # project's members
+    member_count = db.column_property(
+        db.select(db.func.count())
+        .where(user_projects.c.project_id == id)
+        .correlate_except(user_projects)
+        .scalar_subquery(),
+        expire_on_flush=False
+    )
+    
     # Relationships
     creator = db.relationship('User', backref='created_projects')
 
+    __table_args__ = (
+        # Keyset pages seek on (created_at, id), globally or within a status
+        db.Index('ix_project_created_id', created_at, id),
+        db.Index('ix_project_status_created_id', status, created_at, id),
+        trigram_index('ix_project_title_trgm', 'title'),
+        trigram_index('ix_project_description_trgm', 'description'),
+        # Must stay identical to the cast in json_array_contains()
+        db.Index('ix_project_tech_stack', db.cast(tech_stack, JSONB).label('tech_stack_jsonb'),
+                 postgresql_using='gin',
+                 postgresql_ops={'tech_stack_jsonb': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -136,7 +216,7 @@ class Project(db.Model):
             'image_url': self.image_url,
             'looking_for': self.looking_for,
             'created_by': self.created_by,
-            'member_count': len(self.members),
+            'member_count': self.member_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -147,7 +227,6 @@ class Post(db.Model):
     content = db.Column(db.Text, nullable=False)
     post_type = db.Column(db.String(20), default='general')  # general, blog, announcement
     image_url = db.Column(db.String(255))
-    likes_count = db.Column(db.Integer, default=0)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     community_id = db.Column(db.Integer, db.ForeignKey('community.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -157,6 +236,12 @@ class Post(db.Model):
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='post', lazy=True, cascade='all, delete-orphan')
 
+    # Feed pages seek on (created_at, id), globally or within a community
+    __table_args__ = (
+        db.Index('ix_post_created_id', created_at, id),
+        db.Index('ix_post_community_created_id', community_id, created_at, id),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -167,7 +252,7 @@ class Post(db.Model):
             'likes_count': self.likes_count,
             'author_id': self.author_id,
             'community_id': self.community_id,
-            'comments_count': len(self.comments),
+            'comments_count': self.comments_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -176,13 +261,19 @@ class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
-    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'))  # For nested comments
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'), index=True)  # For nested comments
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]), lazy=True)
 
+    # A post's top-level comments, already in display order
+    __table_args__ = (
+        db.Index('ix_comment_post_root_created', post_id, created_at,
+                 postgresql_where=parent_id.is_(None), sqlite_where=parent_id.is_(None)),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -190,10 +281,31 @@ class Comment(db.Model):
             'author_id': self.author_id,
             'post_id': self.post_id,
             'parent_id': self.parent_id,
-            'replies_count': len(self.replies),
+            'replies_count': self.replies_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Counted in the same SELECT as the row so lists don't load every post's
+# comments or every comment's replies. Declared after Comment because both
+# counts select from it
+_reply = Comment.__table__.alias('reply')
+
+Post.comments_count = db.column_property(
+    db.select(db.func.count())
+    .where(Comment.post_id == Post.id)
+    .correlate_except(Comment)
+    .scalar_subquery(),
+    expire_on_flush=False
+)
+
+Comment.replies_count = db.column_property(
+    db.select(db.func.count())
+    .where(_reply.c.parent_id == Comment.id)
+    .correlate_except(_reply)
+    .scalar_subquery(),
+    expire_on_flush=False
+)
+
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -201,7 +313,21 @@ class Like(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Unique constraint to prevent duplicate likes
-    __table_args__ = (db.UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),
+        # The unique constraint leads with user_id; per-post counts need their own index
+        db.Index('ix_like_post_id', 'post_id'),
+    )
+
+# Derived from the likes themselves instead of a counter column that every
+# like and unlike had to update
+Post.likes_count = db.column_property(
+    db.select(db.func.count())
+    .where(Like.post_id == Post.id)
+    .correlate_except(Like)
+    .scalar_subquery(),
+    expire_on_flush=False
+)
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -219,9 +345,26 @@ class Event(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Counted in the same SELECT as the event row so listings don't load
+    # every attendee collection
+    attendees_count = db.column_property(
+        db.select(db.func.count())
+        .where(user_events.c.event_id == id)
+        .correlate_except(user_events)
+        .scalar_subquery(),
+        expire_on_flush=False
+    )
+    
     # Relationships
     creator = db.relationship('User', backref='created_events')
 
+    __table_args__ = (
+        db.Index('ix_event_start_date_id', start_date, id),
+        db.Index('ix_event_type_start_date', event_type, start_date),
+        db.Index('ix_event_search', search_vector(title, description),
+                 postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -237,7 +380,7 @@ class Event(db.Model):
             'registration_deadline': self.registration_deadline.isoformat() if self.registration_deadline else None,
             'image_url': self.image_url,
             'created_by': self.created_by,
-            'attendees_count': len(self.attendees),
+            'attendees_count': self.attendees_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -260,6 +403,16 @@ class Tutorial(db.Model):
     # Relationships
     creator = db.relationship('User', backref='created_tutorials')
 
+    __table_args__ = (
+        # Newest-first listings, globally or within a category or difficulty.
+        # The category index also answers the distinct category lookup
+        db.Index('ix_tutorial_created_id', created_at, id),
+        db.Index('ix_tutorial_category_created_id', category, created_at, id),
+        db.Index('ix_tutorial_difficulty_created_id', difficulty, created_at, id),
+        db.Index('ix_tutorial_search', search_vector(title, description, tags),
+                 postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -286,6 +439,16 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Inbox and conversation pages seek on (created_at, id) per participant;
+    # unread counts only ever look at the small unread slice
+    __table_args__ = (
+        db.Index('ix_message_sender_created', sender_id, created_at, id),
+        db.Index('ix_message_receiver_created', receiver_id, created_at, id),
+        db.Index('ix_message_pair_created', sender_id, receiver_id, created_at),
+        db.Index('ix_message_unread', receiver_id, sender_id,
+                 postgresql_where=(is_read == False), sqlite_where=(is_read == False)),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+# Keyset cursors are the sort key of the last row on a page, JSON encoded and
+# made URL safe. Clients treat them as opaque strings
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+
+
+def decode_keyset_cursor(cursor):
+    # A (timestamp, id) cursor as the list views write it. Anything else,
+    # including a payload that decodes but holds the wrong types, is None so
+    # the caller can answer 400
+    position = decode_cursor(cursor)
+    if not isinstance(position, list) or len(position) != 2:
+        return None
+    timestamp, row_id = position
+    if not isinstance(timestamp, str) or type(row_id) is not int:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if timestamp.tzinfo is not None:
+        return None
+    return timestamp, row_id
+
+
+def decode_id_cursor(cursor):
+    # A single-id cursor, or None if the payload isn't exactly one integer
+    position = decode_cursor(cursor)
+    if not isinstance(position, list) or len(position) != 1 or type(position[0]) is not int:
+        return None
+    return position[0]
+
+
+# Largest page a list view will return in one response
+MAX_PER_PAGE = 100
+
+
+def clamp_per_page(per_page):
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def keyset_page(query, timestamp_column, id_column, cursor, per_page, descending=True):
+    # Keyset mode for the list views: continue after the last (timestamp, id)
+    # seen rather than counting and skipping rows. An empty cursor starts
+    # from the top. Returns the page and the cursor for the next one, or None
+    # when the cursor is invalid
+    per_page = clamp_per_page(per_page)
+    key = tuple_(timestamp_column, id_column)
+    if cursor:
+        position = decode_keyset_cursor(cursor)
+        if position is None:
+            return None
+        query = query.filter(key < position if descending else key > position)
+    
+    if descending:
+        query = query.order_by(timestamp_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(timestamp_column.asc(), id_column.asc())
+    
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key).isoformat(), getattr(last, id_column.key))
+    return rows, next_cursor
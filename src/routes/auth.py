@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from src.cache import invalidate
 from src.models.models import User, db
 import json
 
@@ -16,11 +18,14 @@ def register():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
-        # Check if user already exists
-        if User.query.filter_by(username=data['username']).first():
+        # Check if user already exists; one query covers both unique fields
+        taken = db.session.query(User.username, User.email).filter(
+            (User.username == data['username']) | (User.email == data['email'])
+        ).all()
+        if any(row.username == data['username'] for row in taken):
             return jsonify({'error': 'Username already exists'}), 400
         
-        if User.query.filter_by(email=data['email']).first():
+        if taken:
             return jsonify({'error': 'Email already exists'}), 400
         
         # Create new user
@@ -41,15 +46,24 @@ def register():
         user.set_password(data['password'])
         
         db.session.add(user)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Lost a race with a concurrent registration for the same name
+            db.session.rollback()
+            return jsonify({'error': 'Username or email already exists'}), 400
+        
+        user_data = user.to_dict()
         db.session.commit()
+        invalidate('users')
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user_data['id'])
         
         return jsonify({
             'message': 'User registered successfully',
             'access_token': access_token,
-            'user': user.to_dict()
+            'user': user_data
         }), 201
         
     except Exception as e:
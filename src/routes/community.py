@@ -1,10 +1,19 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.models import Community, User, db
+from src.cache import invalidate
+from src.models.models import Community, User, db, user_communities
 import json
 
 community_bp = Blueprint('community', __name__)
 
+def _is_member(community_id, user_id):
+    return db.session.query(
+        db.exists().where(
+            (user_communities.c.community_id == community_id) &
+            (user_communities.c.user_id == user_id)
+        )
+    ).scalar()
+
 @community_bp.route('/', methods=['GET'])
 def get_communities():
     try:
@@ -60,11 +69,13 @@ def create_community():
         )
         
         db.session.add(community)
-        db.session.commit()
+        db.session.flush()
         
-        # Add creator as a member
-        creator = User.query.get(current_user_id)
-        community.members.append(creator)
+        # Add creator as a member in the same transaction
+        db.session.execute(user_communities.insert().values(
+            user_id=current_user_id,
+            community_id=community.id
+        ))
         db.session.commit()
         
         return jsonify(community.to_dict()), 201
@@ -91,6 +102,9 @@ def update_community(community_id):
         community.is_private = data.get('is_private', community.is_private)
         
         db.session.commit()
+        # Re-read the row so the response carries what the columns stored,
+        # not the request values the attributes still hold
+        db.session.refresh(community)
         
         return jsonify(community.to_dict()), 200
         
@@ -109,6 +123,8 @@ def delete_community(community_id):
         
         db.session.delete(community)
         db.session.commit()
+        # The community's posts are deleted with it
+        invalidate('posts')
         
         return '', 204
         
@@ -120,13 +136,17 @@ def delete_community(community_id):
 def join_community(community_id):
     try:
         current_user_id = get_jwt_identity()
-        community = Community.query.get_or_404(community_id)
-        user = User.query.get(current_user_id)
+        Community.query.get_or_404(community_id)
         
-        if user in community.members:
+        if _is_member(community_id, current_user_id):
             return jsonify({'error': 'Already a member of this community'}), 400
         
-        community.members.append(user)
+        # Insert the membership row directly; appending to community.members
+        # would load the whole member list first
+        db.session.execute(user_communities.insert().values(
+            user_id=current_user_id,
+            community_id=community_id
+        ))
         db.session.commit()
         
         return jsonify({'message': 'Successfully joined community'}), 200
@@ -140,15 +160,17 @@ def leave_community(community_id):
     try:
         current_user_id = get_jwt_identity()
         community = Community.query.get_or_404(community_id)
-        user = User.query.get(current_user_id)
         
-        if user not in community.members:
+        if not _is_member(community_id, current_user_id):
             return jsonify({'error': 'Not a member of this community'}), 400
         
         if community.created_by == current_user_id:
             return jsonify({'error': 'Community creator cannot leave'}), 400
         
-        community.members.remove(user)
+        db.session.execute(user_communities.delete().where(
+            (user_communities.c.community_id == community_id) &
+            (user_communities.c.user_id == current_user_id)
+        ))
         db.session.commit()
         
         return jsonify({'message': 'Successfully left community'}), 200
@@ -159,8 +181,18 @@ def leave_community(community_id):
 @community_bp.route('/<int:community_id>/members', methods=['GET'])
 def get_community_members(community_id):
     try:
-        community = Community.query.get_or_404(community_id)
-        return jsonify([member.to_dict() for member in community.members]), 200
+        # The community and its members in one outer-joined query; no rows at
+        # all means the community doesn't exist
+        rows = db.session.query(Community.id, User).outerjoin(
+            user_communities, user_communities.c.community_id == Community.id
+        ).outerjoin(
+            User, User.id == user_communities.c.user_id
+        ).filter(Community.id == community_id).all()
+        
+        if not rows:
+            return jsonify({'error': 'Community not found'}), 404
+        
+        return jsonify([member.to_dict() for _, member in rows if member is not None]), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,32 +1,89 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.models import Event, User, db
-from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from src.cache import cached_view, invalidate
+from src.models.models import Event, User, db, search_filter, user_events
+from src.pagination import keyset_page
+from datetime import datetime, timezone
+import sys
 
 event_bp = Blueprint('event', __name__)
 
+# List endpoints select plain column rows instead of hydrating Event objects.
+# to_dict() only reads attributes, so it serializes a Row the same way
+EVENT_COLUMNS = (*Event.__table__.columns, Event.attendees_count)
+
+_TRUE_VALUES = frozenset(('1', 'true', 'yes', 'on'))
+
+def _bool_arg(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.lower() in _TRUE_VALUES
+
+def _is_attendee(event_id, user_id):
+    return db.session.query(
+        db.exists().where(
+            (user_events.c.event_id == event_id) &
+            (user_events.c.user_id == user_id)
+        )
+    ).scalar()
+
+def _parse_iso(value):
+    # fromisoformat() accepts a trailing 'Z' from Python 3.11 on, so the
+    # rewrite is only needed on older interpreters
+    if not value:
+        return None
+    if sys.version_info < (3, 11) and value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    # Dates are stored as naive UTC. Converting here keeps the
+    # create response, which echoes the assigned value, identical to reads
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 @event_bp.route('/', methods=['GET'])
+@cached_view('events', timeout=60)
 def get_events():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         event_type = request.args.get('type')
-        upcoming = request.args.get('upcoming', 'true').lower() == 'true'
+        search = request.args.get('search')
+        upcoming = _bool_arg('upcoming', True)
         
-        query = Event.query
+        query = Event.query.with_entities(*EVENT_COLUMNS)
         
         if event_type:
             query = query.filter_by(event_type=event_type)
         
+        if search:
+            query = query.filter(search_filter((Event.title, Event.description), search))
+        
         if upcoming:
             query = query.filter(Event.start_date >= datetime.utcnow())
         
+        # Keyset mode, soonest first; an empty cursor starts a new feed
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            keyset = keyset_page(query, Event.start_date, Event.id, cursor, per_page, descending=False)
+            if keyset is None:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            rows, next_cursor = keyset
+            
+            return jsonify({
+                'events': [Event.to_dict(row) for row in rows],
+                'next_cursor': next_cursor
+            }), 200
+        
         events = query.order_by(Event.start_date.asc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'events': [event.to_dict() for event in events.items],
+            'events': [Event.to_dict(row) for row in events.items],
             'total': events.total,
             'pages': events.pages,
             'current_page': page
@@ -36,6 +93,7 @@ def get_events():
         return jsonify({'error': str(e)}), 500
 
 @event_bp.route('/<int:event_id>', methods=['GET'])
+@cached_view('events', timeout=120)
 def get_event(event_id):
     try:
         event = Event.query.get_or_404(event_id)
@@ -55,14 +113,9 @@ def create_event():
             return jsonify({'error': 'Event title and start date are required'}), 400
         
         # Parse dates
-        start_date = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00'))
-        end_date = None
-        if data.get('end_date'):
-            end_date = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00'))
-        
-        registration_deadline = None
-        if data.get('registration_deadline'):
-            registration_deadline = datetime.fromisoformat(data['registration_deadline'].replace('Z', '+00:00'))
+        start_date = _parse_iso(data['start_date'])
+        end_date = _parse_iso(data.get('end_date'))
+        registration_deadline = _parse_iso(data.get('registration_deadline'))
         
         event = Event(
             title=data['title'],
@@ -80,14 +133,21 @@ def create_event():
         )
         
         db.session.add(event)
-        db.session.commit()
+        db.session.flush()
         
-        # Add creator as an attendee
-        creator = User.query.get(current_user_id)
-        event.attendees.append(creator)
+        # Add creator as an attendee in the same transaction
+        db.session.execute(user_events.insert().values(
+            user_id=current_user_id,
+            event_id=event.id
+        ))
+        
+        # The creator is the only attendee so far; no need to count
+        set_committed_value(event, 'attendees_count', 1)
+        payload = event.to_dict()
         db.session.commit()
+        invalidate('events')
         
-        return jsonify(event.to_dict()), 201
+        return jsonify(payload), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -115,15 +175,19 @@ def update_event(event_id):
         
         # Update dates if provided
         if data.get('start_date'):
-            event.start_date = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00'))
+            event.start_date = _parse_iso(data['start_date'])
         
         if data.get('end_date'):
-            event.end_date = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00'))
+            event.end_date = _parse_iso(data['end_date'])
         
         if data.get('registration_deadline'):
-            event.registration_deadline = datetime.fromisoformat(data['registration_deadline'].replace('Z', '+00:00'))
+            event.registration_deadline = _parse_iso(data['registration_deadline'])
         
         db.session.commit()
+        # Re-read the row so the response carries what the columns stored,
+        # not the request values the attributes still hold
+        db.session.refresh(event)
+        invalidate('events')
         
         return jsonify(event.to_dict()), 200
         
@@ -140,8 +204,12 @@ def delete_event(event_id):
         if event.created_by != current_user_id:
             return jsonify({'error': 'Permission denied'}), 403
         
+        # One DELETE for all registrations instead of loading the attendees
+        # and deleting their rows one by one
+        db.session.execute(user_events.delete().where(user_events.c.event_id == event_id))
         db.session.delete(event)
         db.session.commit()
+        invalidate('events')
         
         return '', 204
         
@@ -153,10 +221,29 @@ def delete_event(event_id):
 def register_for_event(event_id):
     try:
         current_user_id = get_jwt_identity()
-        event = Event.query.get_or_404(event_id)
-        user = User.query.get(current_user_id)
         
-        if user in event.attendees:
+        # Event row, registration status and capacity in one round trip. The
+        # DB answers both checks as booleans; attendees are only counted
+        # when the event actually has a cap. The event row stays locked until
+        # commit so concurrent registrations for it are serialized
+        is_registered = db.exists().where(
+            (user_events.c.event_id == Event.id) &
+            (user_events.c.user_id == current_user_id)
+        ).label('is_registered')
+        attendee_count = db.select(db.func.count()).where(
+            user_events.c.event_id == Event.id
+        ).correlate(Event).scalar_subquery()
+        has_room = db.or_(
+            db.func.coalesce(Event.max_attendees, 0) == 0,
+            attendee_count < Event.max_attendees
+        )
+        event, already_registered, has_room_now = db.session.query(
+            Event, is_registered, has_room.label('has_room')
+        ).options(db.defer(Event.attendees_count)).filter(
+            Event.id == event_id
+        ).with_for_update(of=Event).first_or_404()
+        
+        if already_registered:
             return jsonify({'error': 'Already registered for this event'}), 400
         
         # Check if registration is still open
@@ -164,11 +251,29 @@ def register_for_event(event_id):
             return jsonify({'error': 'Registration deadline has passed'}), 400
         
         # Check if event is full
-        if event.max_attendees and len(event.attendees) >= event.max_attendees:
+        if not has_room_now:
+            return jsonify({'error': 'Event is full'}), 400
+        
+        # The INSERT re-checks capacity itself and the primary key rejects
+        # duplicates, so a request racing past the checks above can't
+        # overbook the event or register twice
+        try:
+            inserted = db.session.execute(user_events.insert().from_select(
+                ['user_id', 'event_id'],
+                db.select(db.literal(current_user_id), Event.id).where(
+                    Event.id == event_id, has_room
+                )
+            )).rowcount
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'Already registered for this event'}), 400
+        
+        if not inserted:
+            db.session.rollback()
             return jsonify({'error': 'Event is full'}), 400
         
-        event.attendees.append(user)
         db.session.commit()
+        invalidate('events')
         
         return jsonify({'message': 'Successfully registered for event'}), 200
         
@@ -180,17 +285,20 @@ def register_for_event(event_id):
 def unregister_from_event(event_id):
     try:
         current_user_id = get_jwt_identity()
-        event = Event.query.get_or_404(event_id)
-        user = User.query.get(current_user_id)
+        event = db.session.query(Event.created_by).filter_by(id=event_id).first_or_404()
         
-        if user not in event.attendees:
+        if not _is_attendee(event_id, current_user_id):
             return jsonify({'error': 'Not registered for this event'}), 400
         
         if event.created_by == current_user_id:
             return jsonify({'error': 'Event creator cannot unregister'}), 400
         
-        event.attendees.remove(user)
+        db.session.execute(user_events.delete().where(
+            (user_events.c.event_id == event_id) &
+            (user_events.c.user_id == current_user_id)
+        ))
         db.session.commit()
+        invalidate('events')
         
         return jsonify({'message': 'Successfully unregistered from event'}), 200
         
@@ -200,8 +308,24 @@ def unregister_from_event(event_id):
 @event_bp.route('/<int:event_id>/attendees', methods=['GET'])
 def get_event_attendees(event_id):
     try:
-        event = Event.query.get_or_404(event_id)
-        return jsonify([attendee.to_dict() for attendee in event.attendees]), 200
+        db.session.query(Event.id).filter_by(id=event_id).first_or_404()
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        
+        attendees = User.query.join(
+            user_events, user_events.c.user_id == User.id
+        ).filter(
+            user_events.c.event_id == event_id
+        ).order_by(User.id.asc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        
+        return jsonify({
+            'attendees': [attendee.to_dict() for attendee in attendees.items],
+            'total': attendees.total,
+            'pages': attendees.pages,
+            'current_page': page
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
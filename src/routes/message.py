@@ -1,36 +1,76 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.cache import cache, rate_limit
 from src.models.models import Message, User, db
+from src.pagination import clamp_per_page, keyset_page
 
 message_bp = Blueprint('message', __name__)
 
+# Unread counts are polled constantly, so they're cached per user and the
+# entry is dropped whenever that user's unread set changes
+UNREAD_COUNT_TIMEOUT = 300
+
+def _unread_key(user_id):
+    return f'unread:{user_id}'
+
 @message_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_messages():
     try:
         current_user_id = get_jwt_identity()
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        per_page = clamp_per_page(request.args.get('per_page', 20, type=int))
         other_user_id = request.args.get('user_id', type=int)
         
+        # Plain column rows: no Message objects, identity map or relationship
+        # loading. to_dict() only reads attributes, so it serializes a Row
+        query = Message.query.with_entities(*Message.__table__.columns)
+        
         if other_user_id:
             # Get conversation with specific user
-            messages = Message.query.filter(
+            query = query.filter(
                 ((Message.sender_id == current_user_id) & (Message.receiver_id == other_user_id)) |
                 ((Message.sender_id == other_user_id) & (Message.receiver_id == current_user_id))
-            ).order_by(Message.created_at.asc()).paginate(
-                page=page, per_page=per_page, error_out=False
             )
+            ascending = True
         else:
             # Get all messages for current user
-            messages = Message.query.filter(
+            query = query.filter(
                 (Message.sender_id == current_user_id) | (Message.receiver_id == current_user_id)
-            ).order_by(Message.created_at.desc()).paginate(
-                page=page, per_page=per_page, error_out=False
             )
+            ascending = False
+        
+        # Polling clients pass the newest id they already have and only get
+        # what arrived after it, oldest first; usually an empty list
+        since_id = request.args.get('since_id', type=int)
+        if since_id is not None:
+            rows = query.filter(Message.id > since_id).order_by(Message.id.asc()).limit(per_page).all()
+            return jsonify({
+                'messages': [Message.to_dict(row) for row in rows]
+            }), 200
+        
+        # Keyset mode in the same order as the pages below; an empty cursor
+        # starts from the top
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            keyset = keyset_page(query, Message.created_at, Message.id, cursor, per_page,
+                                 descending=not ascending)
+            if keyset is None:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            rows, next_cursor = keyset
+            
+            return jsonify({
+                'messages': [Message.to_dict(row) for row in rows],
+                'next_cursor': next_cursor
+            }), 200
+        
+        order = Message.created_at.asc() if ascending else Message.created_at.desc()
+        messages = query.order_by(order).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
         
         return jsonify({
-            'messages': [message.to_dict() for message in messages.items],
+            'messages': [Message.to_dict(row) for row in messages.items],
             'total': messages.total,
             'pages': messages.pages,
             'current_page': page
@@ -41,6 +81,7 @@ def get_messages():
 
 @message_bp.route('/', methods=['POST'])
 @jwt_required()
+@rate_limit(get_jwt_identity, limit=20, window=10)
 def send_message():
     try:
         current_user_id = get_jwt_identity()
@@ -49,8 +90,9 @@ def send_message():
         if not data.get('receiver_id') or not data.get('content'):
             return jsonify({'error': 'Receiver ID and content are required'}), 400
         
-        # Check if receiver exists
-        receiver = User.query.get(data['receiver_id'])
+        # Check if receiver exists. Only the active flag is needed, so don't
+        # load the User and its eager relationships
+        receiver = db.session.query(User.is_active).filter_by(id=data['receiver_id']).first()
         if not receiver:
             return jsonify({'error': 'Receiver not found'}), 404
         
@@ -64,9 +106,13 @@ def send_message():
         )
         
         db.session.add(message)
+        db.session.flush()
+        
+        payload = message.to_dict()
         db.session.commit()
+        cache.delete(_unread_key(payload['receiver_id']))
         
-        return jsonify(message.to_dict()), 201
+        return jsonify(payload), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -92,14 +138,26 @@ def get_message(message_id):
 def mark_message_read(message_id):
     try:
         current_user_id = get_jwt_identity()
-        message = Message.query.get_or_404(message_id)
         
-        # Only receiver can mark message as read
-        if message.receiver_id != current_user_id:
-            return jsonify({'error': 'Permission denied'}), 403
+        # Only receiver can mark message as read. The common case is a single
+        # UPDATE; rows that are already read are left alone
+        updated = Message.query.filter(
+            Message.id == message_id,
+            Message.receiver_id == current_user_id,
+            Message.is_read == False
+        ).update({'is_read': True}, synchronize_session=False)
+        
+        if not updated:
+            # Nothing changed: missing, someone else's, or already read
+            message = db.session.query(Message.receiver_id).filter_by(id=message_id).first()
+            if message is None:
+                return jsonify({'error': 'Message not found'}), 404
+            if message.receiver_id != current_user_id:
+                return jsonify({'error': 'Permission denied'}), 403
         
-        message.is_read = True
         db.session.commit()
+        if updated:
+            cache.delete(_unread_key(current_user_id))
         
         return jsonify({'message': 'Message marked as read'}), 200
         
@@ -112,37 +170,41 @@ def get_conversations():
     try:
         current_user_id = get_jwt_identity()
         
-        # Get latest message with each user
-        subquery = db.session.query(
-            db.func.max(Message.id).label('max_id')
-        ).filter(
+        # Latest message with each user, ranked in SQL and joined to that
+        # user, then unread counts for every sender in one grouped query
+        other_id = db.case(
+            (Message.sender_id == current_user_id, Message.receiver_id),
+            else_=Message.sender_id
+        )
+        ranked = db.select(
+            Message.id.label('message_id'),
+            other_id.label('other_id'),
+            db.func.row_number().over(
+                partition_by=other_id,
+                order_by=(Message.created_at.desc(), Message.id.desc())
+            ).label('rn')
+        ).where(
             (Message.sender_id == current_user_id) | (Message.receiver_id == current_user_id)
-        ).group_by(
-            db.case(
-                (Message.sender_id == current_user_id, Message.receiver_id),
-                else_=Message.sender_id
-            )
         ).subquery()
         
-        latest_messages = db.session.query(Message).filter(
-            Message.id.in_(subquery)
-        ).order_by(Message.created_at.desc()).all()
+        latest_messages = db.session.query(Message, User).join(
+            ranked, ranked.c.message_id == Message.id
+        ).join(
+            User, User.id == ranked.c.other_id
+        ).filter(ranked.c.rn == 1).order_by(Message.created_at.desc()).all()
         
-        conversations = []
-        for message in latest_messages:
-            other_user_id = message.receiver_id if message.sender_id == current_user_id else message.sender_id
-            other_user = User.query.get(other_user_id)
-            
-            if other_user:
-                conversations.append({
-                    'user': other_user.to_dict(),
-                    'last_message': message.to_dict(),
-                    'unread_count': Message.query.filter_by(
-                        sender_id=other_user_id,
-                        receiver_id=current_user_id,
-                        is_read=False
-                    ).count()
-                })
+        unread_counts = dict(db.session.query(
+            Message.sender_id, db.func.count()
+        ).filter(
+            Message.receiver_id == current_user_id,
+            Message.is_read == False
+        ).group_by(Message.sender_id).all())
+        
+        conversations = [{
+            'user': other_user.to_dict(),
+            'last_message': message.to_dict(),
+            'unread_count': unread_counts.get(other_user.id, 0)
+        } for message, other_user in latest_messages]
         
         return jsonify(conversations), 200
         
@@ -155,10 +217,13 @@ def get_unread_count():
     try:
         current_user_id = get_jwt_identity()
         
-        unread_count = Message.query.filter_by(
-            receiver_id=current_user_id,
-            is_read=False
-        ).count()
+        unread_count = cache.get(_unread_key(current_user_id))
+        if unread_count is None:
+            unread_count = Message.query.filter_by(
+                receiver_id=current_user_id,
+                is_read=False
+            ).count()
+            cache.set(_unread_key(current_user_id), unread_count, timeout=UNREAD_COUNT_TIMEOUT)
         
         return jsonify({'unread_count': unread_count}), 200
         
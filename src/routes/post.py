@@ -1,223 +1,318 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import InvalidTokenError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from src.cache import cached_view, conditional, invalidate
 from src.models.models import Post, Comment, Like, User, Community, db
+from src.pagination import keyset_page
 
 post_bp = Blueprint('post', __name__)
 
+# List endpoints select plain column rows instead of hydrating ORM objects.
+# to_dict() only reads attributes, so it serializes a Row the same way
+POST_COLUMNS = (*Post.__table__.columns, Post.comments_count, Post.likes_count)
+COMMENT_COLUMNS = (*Comment.__table__.columns, Comment.replies_count)
+
+# Feed cards don't show the post body; ?fields=summary leaves it out
+SUMMARY_COLUMNS = (
+    Post.id, Post.title, Post.post_type, Post.image_url, Post.author_id,
+    Post.community_id, Post.created_at, Post.comments_count, Post.likes_count
+)
+
+POST_UPDATABLE = ('title', 'content', 'post_type', 'image_url')
+
+def _json_object():
+    # Malformed or non-object bodies get None (a 400 below) instead of
+    # failing further down as a 500
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+def _reader_id():
+    # The feed is public. A missing, expired or malformed token reads it
+    # anonymously rather than failing the request
+    try:
+        verify_jwt_in_request(optional=True)
+    except (InvalidTokenError, JWTExtendedException):
+        return None
+    return get_jwt_identity()
+
+def _is_signed_in():
+    return _reader_id() is not None
+
+def _serialize_posts(rows, current_user_id):
+    # Which of these posts the reader liked, in one query for the whole page
+    liked = set()
+    if current_user_id is not None and rows:
+        liked = set(db.session.scalars(db.select(Like.post_id).where(
+            Like.user_id == current_user_id,
+            Like.post_id.in_([row.id for row in rows])
+        )))
+    # The selected columns are already named like to_dict()'s keys, so each
+    # row becomes a dict in one call. Datetimes are left to orjson, which
+    # writes the same ISO format as isoformat()
+    return [{**row._asdict(), 'liked_by_me': row.id in liked} for row in rows]
+
 @post_bp.route('/', methods=['GET'])
+@cached_view('posts', timeout=30, unless=_is_signed_in)
 def get_posts():
-    try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        community_id = request.args.get('community_id', type=int)
-        post_type = request.args.get('type')
-        
-        query = Post.query
-        
-        if community_id:
-            query = query.filter_by(community_id=community_id)
-        
-        if post_type:
-            query = query.filter_by(post_type=post_type)
-        
-        posts = query.order_by(Post.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+    current_user_id = _reader_id()
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    community_id = request.args.get('community_id', type=int)
+    post_type = request.args.get('type')
+    summary = request.args.get('fields') == 'summary'
+    
+    query = Post.query.with_entities(*(SUMMARY_COLUMNS if summary else POST_COLUMNS))
+    
+    if community_id:
+        query = query.filter_by(community_id=community_id)
+    
+    if post_type:
+        query = query.filter_by(post_type=post_type)
+    
+    # Keyset mode, newest first; an empty cursor starts a new feed
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        keyset = keyset_page(query, Post.created_at, Post.id, cursor, per_page)
+        if keyset is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        rows, next_cursor = keyset
         
         return jsonify({
-            'posts': [post.to_dict() for post in posts.items],
-            'total': posts.total,
-            'pages': posts.pages,
-            'current_page': page
+            'posts': _serialize_posts(rows, current_user_id),
+            'next_cursor': next_cursor
         }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    
+    posts = query.order_by(Post.created_at.desc()).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    
+    return jsonify({
+        'posts': _serialize_posts(posts.items, current_user_id),
+        'total': posts.total,
+        'pages': posts.pages,
+        'current_page': page
+    }), 200
 
 @post_bp.route('/<int:post_id>', methods=['GET'])
+@conditional
+@cached_view('posts', timeout=60)
 def get_post(post_id):
-    try:
-        post = Post.query.get_or_404(post_id)
-        return jsonify(post.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # A single column row by primary key; no ORM instance or identity map
+    post = Post.query.with_entities(*POST_COLUMNS).filter_by(id=post_id).first()
+    if post is None:
+        return jsonify({'error': 'Post not found'}), 404
+    
+    return jsonify(Post.to_dict(post)), 200
 
 @post_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_post():
-    try:
-        current_user_id = get_jwt_identity()
-        data = request.json
-        
-        if not data.get('content'):
-            return jsonify({'error': 'Post content is required'}), 400
-        
-        post = Post(
-            title=data.get('title', ''),
-            content=data['content'],
-            post_type=data.get('post_type', 'general'),
-            image_url=data.get('image_url', ''),
-            author_id=current_user_id,
-            community_id=data.get('community_id')
-        )
-        
-        db.session.add(post)
-        db.session.commit()
-        
-        return jsonify(post.to_dict()), 201
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    current_user_id = get_jwt_identity()
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    if not data.get('content'):
+        return jsonify({'error': 'Post content is required'}), 400
+    
+    post = Post(
+        title=data.get('title', ''),
+        content=data['content'],
+        post_type=data.get('post_type', 'general'),
+        image_url=data.get('image_url', ''),
+        author_id=current_user_id,
+        community_id=data.get('community_id')
+    )
+    
+    db.session.add(post)
+    db.session.flush()
+    
+    # A new post has no comments or likes yet; no need to count
+    set_committed_value(post, 'comments_count', 0)
+    set_committed_value(post, 'likes_count', 0)
+    db.session.commit()
+    invalidate('posts')
+    
+    return jsonify(post.to_dict()), 201
 
 @post_bp.route('/<int:post_id>', methods=['PUT'])
 @jwt_required()
 def update_post(post_id):
-    try:
-        current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
-        
-        if post.author_id != current_user_id:
-            return jsonify({'error': 'Permission denied'}), 403
-        
-        data = request.json
-        
-        post.title = data.get('title', post.title)
-        post.content = data.get('content', post.content)
-        post.post_type = data.get('post_type', post.post_type)
-        post.image_url = data.get('image_url', post.image_url)
-        
-        db.session.commit()
-        
-        return jsonify(post.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    current_user_id = get_jwt_identity()
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    # The UPDATE only matches the author's own post, so the permission check
+    # and the write can't race. The row read back for the response tells a
+    # missing post from someone else's when nothing matched
+    changes = {field: data[field] for field in POST_UPDATABLE if field in data}
+    if changes:
+        Post.query.filter_by(id=post_id, author_id=current_user_id).update(
+            changes, synchronize_session=False
+        )
+    
+    post = Post.query.with_entities(*POST_COLUMNS).filter_by(id=post_id).first_or_404(description='Post not found')
+    if post.author_id != current_user_id:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    db.session.commit()
+    invalidate('posts')
+    
+    return jsonify(Post.to_dict(post)), 200
 
 @post_bp.route('/<int:post_id>', methods=['DELETE'])
 @jwt_required()
 def delete_post(post_id):
-    try:
-        current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
-        
-        if post.author_id != current_user_id:
-            return jsonify({'error': 'Permission denied'}), 403
-        
-        db.session.delete(post)
-        db.session.commit()
-        
-        return '', 204
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    current_user_id = get_jwt_identity()
+    
+    # Likes, comments and the post itself are deleted in place, each only
+    # if the post is the current user's, without loading any of them
+    owned = db.select(Post.id).where(Post.id == post_id, Post.author_id == current_user_id)
+    Like.query.filter(Like.post_id.in_(owned)).delete(synchronize_session=False)
+    Comment.query.filter(Comment.post_id.in_(owned)).delete(synchronize_session=False)
+    deleted = Post.query.filter_by(id=post_id, author_id=current_user_id).delete(synchronize_session=False)
+    
+    if not deleted:
+        db.session.query(Post.id).filter_by(id=post_id).first_or_404(description='Post not found')
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    db.session.commit()
+    invalidate('posts')
+    
+    return '', 204
 
 @post_bp.route('/<int:post_id>/like', methods=['POST'])
 @jwt_required()
 def like_post(post_id):
-    try:
-        current_user_id = get_jwt_identity()
-        post = Post.query.get_or_404(post_id)
-        
-        # Check if user already liked the post
-        existing_like = Like.query.filter_by(user_id=current_user_id, post_id=post_id).first()
-        
-        if existing_like:
-            # Unlike the post
-            db.session.delete(existing_like)
-            post.likes_count = max(0, post.likes_count - 1)
-            message = 'Post unliked'
-        else:
-            # Like the post
-            like = Like(user_id=current_user_id, post_id=post_id)
-            db.session.add(like)
-            post.likes_count += 1
-            message = 'Post liked'
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': message,
-            'likes_count': post.likes_count
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    current_user_id = get_jwt_identity()
+    
+    # Toggle without reading first: removing an existing like tells us
+    # which way we're going. A new like is only inserted if the post
+    # exists, so the INSERT doubles as the 404 check
+    unliked = Like.query.filter_by(
+        user_id=current_user_id, post_id=post_id
+    ).delete(synchronize_session=False)
+    
+    if unliked:
+        message = 'Post unliked'
+    else:
+        try:
+            liked = db.session.execute(db.insert(Like).from_select(
+                ['user_id', 'post_id'],
+                db.select(db.literal(current_user_id), Post.id).where(Post.id == post_id)
+            )).rowcount
+        except IntegrityError:
+            # A concurrent request from the same user liked it first
+            db.session.rollback()
+            return jsonify({'error': 'Post already liked'}), 400
+        
+        if not liked:
+            db.session.rollback()
+            return jsonify({'error': 'Post not found'}), 404
+        message = 'Post liked'
+    
+    likes_count = db.session.query(db.func.count(Like.id)).filter_by(post_id=post_id).scalar()
+    db.session.commit()
+    invalidate('posts')
+    
+    return jsonify({
+        'message': message,
+        'likes_count': likes_count
+    }), 200
 
 @post_bp.route('/<int:post_id>/comments', methods=['GET'])
+@conditional
+@cached_view('posts', timeout=30)
 def get_post_comments(post_id):
-    try:
-        post = Post.query.get_or_404(post_id)
-        comments = Comment.query.filter_by(post_id=post_id, parent_id=None).order_by(Comment.created_at.desc()).all()
-        
-        return jsonify([comment.to_dict() for comment in comments]), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    db.session.query(Post.id).filter_by(id=post_id).first_or_404(description='Post not found')
+    # yield_per only bounds how many raw rows are fetched from the driver
+    # at a time; the response list below still holds every comment
+    comments = Comment.query.with_entities(*COMMENT_COLUMNS).filter_by(
+        post_id=post_id, parent_id=None
+    ).order_by(Comment.created_at.desc()).execution_options(yield_per=200)
+    
+    return jsonify([Comment.to_dict(row) for row in comments]), 200
 
 @post_bp.route('/<int:post_id>/comments', methods=['POST'])
 @jwt_required()
-def create_comment():
-    try:
-        current_user_id = get_jwt_identity()
-        post_id = request.view_args['post_id']
-        data = request.json
-        
-        if not data.get('content'):
-            return jsonify({'error': 'Comment content is required'}), 400
-        
-        post = Post.query.get_or_404(post_id)
-        
-        comment = Comment(
-            content=data['content'],
-            author_id=current_user_id,
-            post_id=post_id,
-            parent_id=data.get('parent_id')
-        )
-        
-        db.session.add(comment)
-        db.session.commit()
-        
-        return jsonify(comment.to_dict()), 201
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+def create_comment(post_id):
+    current_user_id = get_jwt_identity()
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    if not data.get('content'):
+        return jsonify({'error': 'Comment content is required'}), 400
+    
+    db.session.query(Post.id).filter_by(id=post_id).first_or_404(description='Post not found')
+    
+    comment = Comment(
+        content=data['content'],
+        author_id=current_user_id,
+        post_id=post_id,
+        parent_id=data.get('parent_id')
+    )
+    
+    db.session.add(comment)
+    db.session.flush()
+    
+    # A new comment has no replies yet; no need to count
+    set_committed_value(comment, 'replies_count', 0)
+    payload = comment.to_dict()
+    db.session.commit()
+    invalidate('posts')
+    
+    return jsonify(payload), 201
 
 @post_bp.route('/comments/<int:comment_id>', methods=['PUT'])
 @jwt_required()
 def update_comment(comment_id):
-    try:
-        current_user_id = get_jwt_identity()
-        comment = Comment.query.get_or_404(comment_id)
-        
-        if comment.author_id != current_user_id:
-            return jsonify({'error': 'Permission denied'}), 403
-        
-        data = request.json
-        comment.content = data.get('content', comment.content)
-        
-        db.session.commit()
-        
-        return jsonify(comment.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    current_user_id = get_jwt_identity()
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    # Same conditional UPDATE and read-back as update_post
+    if 'content' in data:
+        Comment.query.filter_by(id=comment_id, author_id=current_user_id).update(
+            {'content': data['content']}, synchronize_session=False
+        )
+    
+    comment = Comment.query.with_entities(*COMMENT_COLUMNS).filter_by(id=comment_id).first_or_404(description='Comment not found')
+    if comment.author_id != current_user_id:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    db.session.commit()
+    invalidate('posts')
+    
+    return jsonify(Comment.to_dict(comment)), 200
 
 @post_bp.route('/comments/<int:comment_id>', methods=['DELETE'])
 @jwt_required()
 def delete_comment(comment_id):
-    try:
-        current_user_id = get_jwt_identity()
-        comment = Comment.query.get_or_404(comment_id)
-        
-        if comment.author_id != current_user_id:
-            return jsonify({'error': 'Permission denied'}), 403
-        
-        db.session.delete(comment)
-        db.session.commit()
-        
-        return '', 204
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    current_user_id = get_jwt_identity()
+    
+    # Replies outlive their parent as top-level comments, as they did when
+    # the ORM nulled parent_id on delete. Both statements only match the
+    # author's own comment
+    owned = db.select(Comment.id).where(
+        Comment.id == comment_id, Comment.author_id == current_user_id
+    ).correlate(None)
+    Comment.query.filter(Comment.parent_id.in_(owned)).update(
+        {'parent_id': None}, synchronize_session=False
+    )
+    deleted = Comment.query.filter_by(id=comment_id, author_id=current_user_id).delete(synchronize_session=False)
+    
+    if not deleted:
+        db.session.query(Comment.id).filter_by(id=comment_id).first_or_404(description='Comment not found')
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    db.session.commit()
+    invalidate('posts')
+    
+    return '', 204
 
@@ -1,32 +1,72 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.models import Project, User, db
+from sqlalchemy.orm.attributes import set_committed_value
+from src.cache import cached_view, invalidate
+from src.models.models import Project, User, db, json_array_contains, user_projects
+from src.pagination import keyset_page
 import json
 
 project_bp = Blueprint('project', __name__)
 
+# Fields a project's creator may change; the list fields are stored as JSON text
+PROJECT_UPDATABLE = frozenset(('title', 'description', 'status', 'github_url', 'demo_url', 'image_url'))
+PROJECT_JSON_FIELDS = frozenset(('tech_stack', 'looking_for'))
+
+# Lists select plain column rows instead of hydrating ORM objects.
+# to_dict() only reads attributes, so it serializes a Row the same way
+PROJECT_COLUMNS = (*Project.__table__.columns, Project.member_count)
+MEMBER_COLUMNS = tuple(column for column in User.__table__.columns if column.key != 'password_hash')
+
+def _is_member(project_id, user_id):
+    return db.session.query(
+        db.exists().where(
+            (user_projects.c.project_id == project_id) &
+            (user_projects.c.user_id == user_id)
+        )
+    ).scalar()
+
 @project_bp.route('/', methods=['GET'])
+@cached_view('projects', timeout=60)
 def get_projects():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status')
         tech = request.args.get('tech')
+        search = request.args.get('search')
         
-        query = Project.query
+        query = Project.query.with_entities(*PROJECT_COLUMNS)
         
         if status:
             query = query.filter_by(status=status)
         
+        if search:
+            # Served by the trigram indexes on PostgreSQL
+            pattern = f'%{search}%'
+            query = query.filter(db.or_(Project.title.ilike(pattern), Project.description.ilike(pattern)))
+        
         if tech:
-            query = query.filter(Project.tech_stack.contains(tech))
+            query = query.filter(json_array_contains(Project.tech_stack, tech))
+        
+        # Keyset mode, newest first; an empty cursor starts from the top
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            keyset = keyset_page(query, Project.created_at, Project.id, cursor, per_page)
+            if keyset is None:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            rows, next_cursor = keyset
+            
+            return jsonify({
+                'projects': [Project.to_dict(row) for row in rows],
+                'next_cursor': next_cursor
+            }), 200
         
         projects = query.paginate(
             page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'projects': [project.to_dict() for project in projects.items],
+            'projects': [Project.to_dict(row) for row in projects.items],
             'total': projects.total,
             'pages': projects.pages,
             'current_page': page
@@ -36,6 +76,7 @@ def get_projects():
         return jsonify({'error': str(e)}), 500
 
 @project_bp.route('/<int:project_id>', methods=['GET'])
+@cached_view('projects', timeout=120)
 def get_project(project_id):
     try:
         project = Project.query.get_or_404(project_id)
@@ -67,12 +108,17 @@ def create_project():
         )
         
         db.session.add(project)
+        db.session.flush()
+        
+        # Add creator as a member in the same transaction
+        db.session.execute(user_projects.insert().values(
+            user_id=current_user_id,
+            project_id=project.id
+        ))
+        # The creator is the only member so far; no need to count
+        set_committed_value(project, 'member_count', 1)
         db.session.commit()
-        
-        # Add creator as a member
-        creator = User.query.get(current_user_id)
-        project.members.append(creator)
-        db.session.commit()
+        invalidate('projects')
         
         return jsonify(project.to_dict()), 201
         
@@ -91,16 +137,19 @@ def update_project(project_id):
         
         data = request.json
         
-        project.title = data.get('title', project.title)
-        project.description = data.get('description', project.description)
-        project.tech_stack = json.dumps(data.get('tech_stack', json.loads(project.tech_stack or '[]')))
-        project.status = data.get('status', project.status)
-        project.github_url = data.get('github_url', project.github_url)
-        project.demo_url = data.get('demo_url', project.demo_url)
-        project.image_url = data.get('image_url', project.image_url)
-        project.looking_for = json.dumps(data.get('looking_for', json.loads(project.looking_for or '[]')))
+        # Only touch the fields that were sent; the stored lists are no
+        # longer decoded and re-encoded when they aren't part of the update
+        for field, value in data.items():
+            if field in PROJECT_JSON_FIELDS:
+                setattr(project, field, json.dumps(value))
+            elif field in PROJECT_UPDATABLE:
+                setattr(project, field, value)
         
         db.session.commit()
+        # Re-read the row so the response carries what the columns stored,
+        # not the request values the attributes still hold
+        db.session.refresh(project)
+        invalidate('projects')
         
         return jsonify(project.to_dict()), 200
         
@@ -117,8 +166,12 @@ def delete_project(project_id):
         if project.created_by != current_user_id:
             return jsonify({'error': 'Permission denied'}), 403
         
-        db.session.delete(project)
+        # One DELETE for all memberships, then the project row itself.
+        # session.delete() would load the members just to unlink them
+        db.session.execute(user_projects.delete().where(user_projects.c.project_id == project_id))
+        Project.query.filter_by(id=project_id).delete(synchronize_session=False)
         db.session.commit()
+        invalidate('projects')
         
         return '', 204
         
@@ -130,14 +183,19 @@ def delete_project(project_id):
 def join_project(project_id):
     try:
         current_user_id = get_jwt_identity()
-        project = Project.query.get_or_404(project_id)
-        user = User.query.get(current_user_id)
+        db.session.query(Project.id).filter_by(id=project_id).first_or_404()
         
-        if user in project.members:
+        if _is_member(project_id, current_user_id):
             return jsonify({'error': 'Already a member of this project'}), 400
         
-        project.members.append(user)
+        # Insert the membership row directly; appending to project.members
+        # would load the whole member list first
+        db.session.execute(user_projects.insert().values(
+            user_id=current_user_id,
+            project_id=project_id
+        ))
         db.session.commit()
+        invalidate('projects')
         
         return jsonify({'message': 'Successfully joined project'}), 200
         
@@ -149,17 +207,23 @@ def join_project(project_id):
 def leave_project(project_id):
     try:
         current_user_id = get_jwt_identity()
-        project = Project.query.get_or_404(project_id)
-        user = User.query.get(current_user_id)
-        
-        if user not in project.members:
-            return jsonify({'error': 'Not a member of this project'}), 400
+        project = db.session.query(Project.created_by).filter_by(id=project_id).first_or_404()
         
+        # The creator is always a member, so this can be answered before
+        # touching the membership table
         if project.created_by == current_user_id:
             return jsonify({'error': 'Project creator cannot leave'}), 400
         
-        project.members.remove(user)
+        # Delete the membership directly; no row deleted means there was none
+        left = db.session.execute(user_projects.delete().where(
+            (user_projects.c.project_id == project_id) &
+            (user_projects.c.user_id == current_user_id)
+        )).rowcount
+        if not left:
+            return jsonify({'error': 'Not a member of this project'}), 400
+        
         db.session.commit()
+        invalidate('projects')
         
         return jsonify({'message': 'Successfully left project'}), 200
         
@@ -169,8 +233,18 @@ def leave_project(project_id):
 @project_bp.route('/<int:project_id>/members', methods=['GET'])
 def get_project_members(project_id):
     try:
-        project = Project.query.get_or_404(project_id)
-        return jsonify([member.to_dict() for member in project.members]), 200
+        # The project and its members in one outer-joined query; no rows at
+        # all means the project doesn't exist
+        rows = db.session.query(Project.id.label('project_id'), *MEMBER_COLUMNS).outerjoin(
+            user_projects, user_projects.c.project_id == Project.id
+        ).outerjoin(
+            User, User.id == user_projects.c.user_id
+        ).filter(Project.id == project_id).all()
+        
+        if not rows:
+            return jsonify({'error': 'Project not found'}), 404
+        
+        return jsonify([User.to_dict(row) for row in rows if row.id is not None]), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,11 +1,31 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.models import Tutorial, db
+from src.cache import cached_view, invalidate
+from src.models.models import Tutorial, db, search_filter
+from src.pagination import keyset_page
 import json
 
 tutorial_bp = Blueprint('tutorial', __name__)
 
+# Lists select plain column rows instead of hydrating ORM objects. List cards
+# don't show the tutorial body; ?fields=summary leaves it out
+TUTORIAL_COLUMNS = tuple(Tutorial.__table__.columns)
+SUMMARY_COLUMNS = tuple(column for column in TUTORIAL_COLUMNS if column.key != 'content')
+
+# Fields a tutorial's creator may change; tags are stored as JSON text
+TUTORIAL_UPDATABLE = ('title', 'description', 'content', 'category', 'difficulty', 'duration',
+                      'video_url', 'external_url', 'image_url')
+
+def _list_columns():
+    return SUMMARY_COLUMNS if request.args.get('fields') == 'summary' else TUTORIAL_COLUMNS
+
+def _serialize_tutorials(rows):
+    # The selected columns are named like to_dict()'s keys, so each row
+    # becomes a dict in one call; orjson writes the datetimes in ISO format
+    return [row._asdict() for row in rows]
+
 @tutorial_bp.route('/', methods=['GET'])
+@cached_view('tutorials', timeout=60)
 def get_tutorials():
     try:
         page = request.args.get('page', 1, type=int)
@@ -13,7 +33,7 @@ def get_tutorials():
         category = request.args.get('category')
         difficulty = request.args.get('difficulty')
         
-        query = Tutorial.query
+        query = Tutorial.query.with_entities(*_list_columns())
         
         if category:
             query = query.filter_by(category=category)
@@ -21,12 +41,25 @@ def get_tutorials():
         if difficulty:
             query = query.filter_by(difficulty=difficulty)
         
+        # Keyset mode, newest first; an empty cursor starts from the top
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            keyset = keyset_page(query, Tutorial.created_at, Tutorial.id, cursor, per_page)
+            if keyset is None:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            tutorials, next_cursor = keyset
+            
+            return jsonify({
+                'tutorials': _serialize_tutorials(tutorials),
+                'next_cursor': next_cursor
+            }), 200
+        
         tutorials = query.order_by(Tutorial.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'tutorials': [tutorial.to_dict() for tutorial in tutorials.items],
+            'tutorials': _serialize_tutorials(tutorials.items),
             'total': tutorials.total,
             'pages': tutorials.pages,
             'current_page': page
@@ -36,6 +69,7 @@ def get_tutorials():
         return jsonify({'error': str(e)}), 500
 
 @tutorial_bp.route('/<int:tutorial_id>', methods=['GET'])
+@cached_view('tutorials', timeout=300)
 def get_tutorial(tutorial_id):
     try:
         tutorial = Tutorial.query.get_or_404(tutorial_id)
@@ -70,6 +104,11 @@ def create_tutorial():
         
         db.session.add(tutorial)
         db.session.commit()
+        invalidate('tutorials')
+        # The category list is cached apart from the tutorials and only needs
+        # dropping when a write can add or remove a category
+        if tutorial.category:
+            invalidate('tutorial_categories')
         
         return jsonify(tutorial.to_dict()), 201
         
@@ -81,27 +120,32 @@ def create_tutorial():
 def update_tutorial(tutorial_id):
     try:
         current_user_id = get_jwt_identity()
-        tutorial = Tutorial.query.get_or_404(tutorial_id)
+        data = request.json
         
+        # One UPDATE of the sent fields that only matches the creator's own
+        # tutorial, so the permission check and the write can't race. The row
+        # read back for the response tells a missing tutorial from someone
+        # else's when nothing matched. Tags are only re-encoded when sent
+        changes = {field: data[field] for field in TUTORIAL_UPDATABLE if field in data}
+        if 'tags' in data:
+            changes['tags'] = json.dumps(data['tags'])
+        if changes:
+            Tutorial.query.filter_by(id=tutorial_id, created_by=current_user_id).update(
+                changes, synchronize_session=False
+            )
+        
+        tutorial = Tutorial.query.with_entities(*TUTORIAL_COLUMNS).filter_by(id=tutorial_id).first()
+        if tutorial is None:
+            return jsonify({'error': 'Tutorial not found'}), 404
         if tutorial.created_by != current_user_id:
             return jsonify({'error': 'Permission denied'}), 403
         
-        data = request.json
-        
-        tutorial.title = data.get('title', tutorial.title)
-        tutorial.description = data.get('description', tutorial.description)
-        tutorial.content = data.get('content', tutorial.content)
-        tutorial.category = data.get('category', tutorial.category)
-        tutorial.difficulty = data.get('difficulty', tutorial.difficulty)
-        tutorial.duration = data.get('duration', tutorial.duration)
-        tutorial.tags = json.dumps(data.get('tags', json.loads(tutorial.tags or '[]')))
-        tutorial.video_url = data.get('video_url', tutorial.video_url)
-        tutorial.external_url = data.get('external_url', tutorial.external_url)
-        tutorial.image_url = data.get('image_url', tutorial.image_url)
-        
         db.session.commit()
+        invalidate('tutorials')
+        if 'category' in changes:
+            invalidate('tutorial_categories')
         
-        return jsonify(tutorial.to_dict()), 200
+        return jsonify(tutorial._asdict()), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -111,13 +155,16 @@ def update_tutorial(tutorial_id):
 def delete_tutorial(tutorial_id):
     try:
         current_user_id = get_jwt_identity()
-        tutorial = Tutorial.query.get_or_404(tutorial_id)
+        # Only the owner is needed for the permission check; loading the whole
+        # row would pull the content body just to delete it
+        tutorial = db.session.query(Tutorial.created_by).filter_by(id=tutorial_id).first_or_404()
         
         if tutorial.created_by != current_user_id:
             return jsonify({'error': 'Permission denied'}), 403
         
-        db.session.delete(tutorial)
+        Tutorial.query.filter_by(id=tutorial_id).delete(synchronize_session=False)
         db.session.commit()
+        invalidate('tutorials', 'tutorial_categories')
         
         return '', 204
         
@@ -125,6 +172,7 @@ def delete_tutorial(tutorial_id):
         return jsonify({'error': str(e)}), 500
 
 @tutorial_bp.route('/categories', methods=['GET'])
+@cached_view('tutorial_categories', timeout=3600)
 def get_tutorial_categories():
     try:
         categories = db.session.query(Tutorial.category).distinct().filter(Tutorial.category != '').all()
@@ -134,6 +182,7 @@ def get_tutorial_categories():
         return jsonify({'error': str(e)}), 500
 
 @tutorial_bp.route('/search', methods=['GET'])
+@cached_view('tutorials', timeout=60)
 def search_tutorials():
     try:
         query = request.args.get('q', '')
@@ -143,16 +192,30 @@ def search_tutorials():
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        tutorials = Tutorial.query.filter(
-            Tutorial.title.contains(query) | 
-            Tutorial.description.contains(query) |
-            Tutorial.tags.contains(query)
-        ).paginate(
+        matches = Tutorial.query.with_entities(*_list_columns()).filter(
+            search_filter((Tutorial.title, Tutorial.description, Tutorial.tags), query)
+        )
+        
+        # Same keyset mode as the listing above
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            keyset = keyset_page(matches, Tutorial.created_at, Tutorial.id, cursor, per_page)
+            if keyset is None:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            tutorials, next_cursor = keyset
+            
+            return jsonify({
+                'tutorials': _serialize_tutorials(tutorials),
+                'next_cursor': next_cursor,
+                'query': query
+            }), 200
+        
+        tutorials = matches.paginate(
             page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'tutorials': [tutorial.to_dict() for tutorial in tutorials.items],
+            'tutorials': _serialize_tutorials(tutorials.items),
             'total': tutorials.total,
             'pages': tutorials.pages,
             'current_page': page,
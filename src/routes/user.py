@@ -1,56 +1,165 @@
 from flask import Blueprint, jsonify, request
-from src.models.models import User, db
+from src.cache import cached_view, invalidate
+from src.pagination import clamp_per_page, decode_id_cursor, encode_cursor, keyset_page
+from src.models.models import Community, Event, Project, User, db, user_communities, user_events, user_projects
 
 user_bp = Blueprint('user', __name__)
 
+# The list selects only the public columns as plain rows; they are named like
+# to_dict()'s keys, so each row becomes a dict in one call
+USER_COLUMNS = tuple(column for column in User.__table__.columns if column.key != 'password_hash')
+
+# Profile fields a user update may change
+USER_UPDATABLE = ('first_name', 'last_name', 'bio', 'college', 'major', 'year', 'skills',
+                  'github_url', 'linkedin_url', 'portfolio_url')
+
+def _user_exists(user_id):
+    return db.session.query(db.exists().where(User.id == user_id)).scalar()
+
 @user_bp.route('/', methods=['GET'])
+@cached_view('users', timeout=60)
 def get_users():
-    users = User.query.filter_by(is_active=True).all()
-    return jsonify([user.to_dict() for user in users])
+    rows = User.query.with_entities(*USER_COLUMNS).filter(User.is_active).all()
+    return jsonify([row._asdict() for row in rows])
 
-@user_bp.route('/<int:user_id>', methods=['GET'])
+@user_bp.route('/<id:user_id>', methods=['GET'])
+@cached_view('users', timeout=300)
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
     return jsonify(user.to_dict())
 
-@user_bp.route('/<int:user_id>', methods=['PUT'])
+@user_bp.route('/<id:user_id>', methods=['PUT'])
 def update_user(user_id):
-    user = User.query.get_or_404(user_id)
     data = request.json
     
-    # Update user fields
-    user.first_name = data.get('first_name', user.first_name)
-    user.last_name = data.get('last_name', user.last_name)
-    user.bio = data.get('bio', user.bio)
-    user.college = data.get('college', user.college)
-    user.major = data.get('major', user.major)
-    user.year = data.get('year', user.year)
-    user.skills = data.get('skills', user.skills)
-    user.github_url = data.get('github_url', user.github_url)
-    user.linkedin_url = data.get('linkedin_url', user.linkedin_url)
-    user.portfolio_url = data.get('portfolio_url', user.portfolio_url)
+    # Write the sent fields with one UPDATE instead of loading the user and
+    # setting them one by one, then read the row back for the response. The
+    # UPDATE only matches if a value actually differs, so re-saving an
+    # unchanged profile writes nothing and keeps updated_at
+    changes = {field: data[field] for field in USER_UPDATABLE if field in data}
+    updated = 0
+    if changes:
+        updated = User.query.filter_by(id=user_id).filter(db.or_(
+            *(getattr(User, field).is_distinct_from(value) for field, value in changes.items())
+        )).update(changes, synchronize_session=False)
     
-    db.session.commit()
-    return jsonify(user.to_dict())
+    user = User.query.with_entities(*USER_COLUMNS).filter_by(id=user_id).first()
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+    
+    if updated:
+        db.session.commit()
+        invalidate('users')
+    return jsonify(user._asdict())
 
-@user_bp.route('/<int:user_id>', methods=['DELETE'])
+@user_bp.route('/<id:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
-    user.is_active = False
+    # Deactivate in place; a user who was already inactive still answers 204
+    deactivated = User.query.filter_by(id=user_id, is_active=True).update(
+        {'is_active': False}, synchronize_session=False
+    )
+    if not deactivated:
+        db.session.query(User.id).filter_by(id=user_id).first_or_404(description='User not found')
+    
     db.session.commit()
+    invalidate('users')
     return '', 204
 
-@user_bp.route('/<int:user_id>/communities', methods=['GET'])
+@user_bp.route('/<id:user_id>/communities', methods=['GET'])
 def get_user_communities(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify([community.to_dict() for community in user.communities])
+    # The user and their communities in one outer-joined query, as for
+    # projects below; no rows at all means the user doesn't exist
+    rows = db.session.query(User.id, Community).outerjoin(
+        user_communities, user_communities.c.user_id == User.id
+    ).outerjoin(
+        Community, Community.id == user_communities.c.community_id
+    ).filter(User.id == user_id).all()
+    
+    if not rows:
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify([community.to_dict() for _, community in rows if community is not None])
 
-@user_bp.route('/<int:user_id>/projects', methods=['GET'])
+@user_bp.route('/<id:user_id>/projects', methods=['GET'])
 def get_user_projects(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify([project.to_dict() for project in user.projects])
+    # Keyset mode: a bounded page of the user's projects in id order, seeking
+    # on the membership primary key. An empty cursor starts from the top
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        per_page = clamp_per_page(request.args.get('per_page', 10, type=int))
+        query = Project.query.join(
+            user_projects, user_projects.c.project_id == Project.id
+        ).filter(user_projects.c.user_id == user_id)
+        
+        if cursor:
+            last_id = decode_id_cursor(cursor)
+            if last_id is None:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(user_projects.c.project_id > last_id)
+        
+        projects = query.order_by(user_projects.c.project_id.asc()).limit(per_page + 1).all()
+        if not projects and not _user_exists(user_id):
+            return jsonify({'error': 'User not found'}), 404
+        
+        next_cursor = None
+        if len(projects) > per_page:
+            projects = projects[:per_page]
+            next_cursor = encode_cursor(projects[-1].id)
+        
+        return jsonify({
+            'projects': [project.to_dict() for project in projects],
+            'next_cursor': next_cursor
+        })
+    
+    # The user and their projects in one outer-joined query; no rows at all
+    # means the user doesn't exist
+    rows = db.session.query(User.id, Project).outerjoin(
+        user_projects, user_projects.c.user_id == User.id
+    ).outerjoin(
+        Project, Project.id == user_projects.c.project_id
+    ).filter(User.id == user_id).all()
+    
+    if not rows:
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify([project.to_dict() for _, project in rows if project is not None])
 
-@user_bp.route('/<int:user_id>/events', methods=['GET'])
+@user_bp.route('/<id:user_id>/events', methods=['GET'])
 def get_user_events(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify([event.to_dict() for event in user.events])
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    
+    query = Event.query.join(
+        user_events, user_events.c.event_id == Event.id
+    ).filter(
+        user_events.c.user_id == user_id
+    )
+    
+    # Keyset mode, soonest first; an empty cursor starts from the top
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        keyset = keyset_page(query, Event.start_date, Event.id, cursor, per_page, descending=False)
+        if keyset is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        events, next_cursor = keyset
+        if not events and not _user_exists(user_id):
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({
+            'events': [event.to_dict() for event in events],
+            'next_cursor': next_cursor
+        })
+    
+    events = query.order_by(Event.start_date.asc()).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    # The user only needs checking when they have no events at all
+    if not events.total and not _user_exists(user_id):
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify({
+        'events': [event.to_dict() for event in events.items],
+        'total': events.total,
+        'pages': events.pages,
+        'current_page': page
+    })